@@ -1,2 +1,2 @@
 from .agent import *
-from .functions import function_map, all_tools
\ No newline at end of file
+from .functions import function_map, all_tools, TOOLS_BY_NAME
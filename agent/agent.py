@@ -1,9 +1,15 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from rich import print
-from datetime import datetime
-import json, asyncio
+import asyncio
+import sys
+import time
+from hashlib import blake2b
+import httpx
+import orjson
 from config import config
-from .functions import function_map, all_tools
+from logger import get_logger
+from .functions import function_map, TOOLS_BY_NAME
+from .cache import PromptCache, prompt_cache
 from typing import List, Dict, Any
 from rich.markdown import Markdown
 from rich.progress import Progress, SpinnerColumn, TextColumn
@@ -14,78 +20,232 @@ from openai.types import (
     FunctionParameters
 )
 
-from .prompts import *
-client = OpenAI(
+from .prompts import url_injection_prompt, domain_scan_prompt, url_injection_task, domain_scan_task
+
+# 非 Windows 平台上优先使用 uvloop 事件循环（可选依赖）
+if sys.platform != "win32":
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
+__all__ = [
+    "client",
+    "function_call",
+    "url_injection_analysis",
+    "generate_domain_analysis",
+    "website_full_analysis",
+]
+
+logger = get_logger("agent")
+
+# 全局共享的 LLM 客户端，复用 HTTP/2 连接池，避免每次请求重新握手
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60),
+    timeout=httpx.Timeout(60.0, connect=5.0),
+)
+client = AsyncOpenAI(
     base_url=config.openai_base_url,
     api_key=config.openai_api_key,
+    http_client=http_client,
 )
 
-async def function_call(progress: Progress, messages: list, tools: list) -> str:
+# 各分析流程可用的工具子集，在导入时确定一次
+_URL_INJECTION_TOOLS = tuple(TOOLS_BY_NAME[name] for name in (
+    "scan_sql_injection",
+    "scan_template_injection",
+    "fetch_url_content",
+))
+_DOMAIN_TOOLS = tuple(TOOLS_BY_NAME[name] for name in (
+    "scan_subdomain_enumeration",
+    "scan_port_scanning",
+))
+
+# 静态系统消息在导入时构建一次，每次请求复用同一内容，保证前缀完全一致
+_URL_INJECTION_SYSTEM = {"role": "system", "content": url_injection_prompt}
+_DOMAIN_SYSTEM = {"role": "system", "content": domain_scan_prompt}
+
+def _parse_arguments(arguments: str) -> Dict[str, Any] | None:
+    """
+    尝试解析流式累积的工具参数，JSON 尚未完整时返回 None。
+    """
+    # 参数总是 JSON 对象，未以 } 结尾时必然不完整，避免无谓的解析
+    if not arguments.rstrip().endswith("}"):
+        return None
+    try:
+        return orjson.loads(arguments)
+    except orjson.JSONDecodeError:
+        return None
+
+# 正在执行的工具调用，参数相同的并发调用共享同一个任务
+_inflight: Dict[str, asyncio.Task] = {}
+
+# 限制同时运行的工具数量，避免一次启动过多扫描子进程
+_tool_semaphore = asyncio.Semaphore(8)
+
+# 下一次允许启动工具的时间点，用于按 tool_calls_per_minute 限速
+_next_tool_start = 0.0
+
+async def _run_tool(name: str, args: Dict[str, Any]) -> Any:
+    global _next_tool_start
+    if config.tool_calls_per_minute > 0:
+        now = time.monotonic()
+        start = max(now, _next_tool_start)
+        _next_tool_start = start + 60 / config.tool_calls_per_minute
+        await asyncio.sleep(start - now)
+    async with _tool_semaphore:
+        return await function_map[name](**args)
+
+def _dispatch(progress: Progress, task_id, name: str, args: Dict[str, Any]) -> asyncio.Task:
+    """
+    参数流式接收完毕后立即调度工具执行，与模型的后续输出重叠。
+    """
+    key = f"{name}:{blake2b(orjson.dumps(args, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()}"
+    task = _inflight.get(key)
+    if task is not None:
+        logger.info("[grey54]  复用进行中的调用: %s, 参数: %s", name, args)
+        return task
+    logger.info("[grey54]  调用函数: %s, 参数: %s", name, args)
+    progress.update(task_id, description=f"正在执行 {name}...")
+    task = asyncio.create_task(_run_tool(name, args))
+    _inflight[key] = task
+    task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return task
+
+async def function_call(progress: Progress, messages: list, tools: list, cache_key: str | None = None, use_cache: bool = True) -> str:
     """
     Function call 调用工具并添加入消息列表。
+
+    传入 cache_key 时，命中缓存则直接返回上次的分析结果，并在开头注明生成时间；
+    use_cache 为 False 时跳过读取缓存重新分析，新结果仍会写回缓存。
     """
     task_id = progress.add_task("正在启动 Function call", total=100)
+    if cache_key and use_cache:
+        cached = prompt_cache.get(cache_key)
+        if cached is not None:
+            content, created = cached
+            progress.update(task_id, description="命中缓存，跳过分析", completed=100)
+            generated_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))
+            return f"（缓存结果，生成于 {generated_at}；使用 --no-cache 重新扫描）\n\n{content}"
     while True:
-        resp = client.chat.completions.create(
+        stream = await client.chat.completions.create(
             model=config.openai_model,
             messages=messages,
             tools=tools,
             tool_choice="auto",
+            stream=True,
         )
-        msg = resp.choices[0].message
-        messages.append(msg)
-        if msg.tool_calls:
-            tool_calls = msg.tool_calls
-            tasks = []
-            for tool_call in tool_calls:
-                name = tool_call.function.name
-                args = json.loads(tool_call.function.arguments)
-                print(f"[grey54]  调用函数: {name}, 参数: {args}")
-                progress.update(task_id, description=f"正在执行 {name}...")
-                tasks.append(function_map[name](**args))
-
-            results = await asyncio.gather(*tasks)
-            
-            for i, tool_call in enumerate(tool_calls):
-                result = results[i]
-                print(f"[green]✔️[/green] 函数 {tool_call.function.name} 执行完成")
-                progress.update(task_id, description=f"函数 {tool_call.function.name} 完成")
+        content = []
+        # 按 index 累积工具调用的 id、名称和参数片段
+        tool_calls: Dict[int, Dict[str, str]] = {}
+        tasks: Dict[int, asyncio.Task] = {}
+        # 参数无法解析的调用，直接以错误作为结果交给模型
+        arg_errors: Dict[int, Dict[str, str]] = {}
+        try:
+            # 出错或被取消时也要关闭流式响应，及时释放 HTTP/2 流
+            async with stream:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        content.append(delta.content)
+                    for tool_call in delta.tool_calls or []:
+                        call = tool_calls.setdefault(tool_call.index, {"id": "", "name": "", "arguments": ""})
+                        if tool_call.id:
+                            call["id"] = tool_call.id
+                        if tool_call.function:
+                            call["name"] += tool_call.function.name or ""
+                            call["arguments"] += tool_call.function.arguments or ""
+                        if tool_call.index not in tasks and call["name"]:
+                            args = _parse_arguments(call["arguments"])
+                            if args is not None:
+                                tasks[tool_call.index] = _dispatch(progress, task_id, call["name"], args)
+
+            order = sorted(tool_calls)
+            msg = {"role": "assistant", "content": "".join(content) or None}
+            if order:
+                msg["tool_calls"] = [{
+                    "id": tool_calls[i]["id"],
+                    "type": "function",
+                    "function": {"name": tool_calls[i]["name"], "arguments": tool_calls[i]["arguments"]},
+                } for i in order]
+            messages.append(msg)
+            if not order:
+                break
+
+            # 流结束时仍未调度的调用（例如无参数）在此补上
+            for i in order:
+                if i not in tasks:
+                    try:
+                        args = orjson.loads(tool_calls[i]["arguments"] or "{}")
+                    except orjson.JSONDecodeError as e:
+                        print(f"[red]函数 {tool_calls[i]['name']} 的参数无法解析: {e}[/red]")
+                        arg_errors[i] = {"error": f"参数不是合法的 JSON: {e}"}
+                        continue
+                    tasks[i] = _dispatch(progress, task_id, tool_calls[i]["name"], args)
+
+            async def finish(i: int):
+                if i in arg_errors:
+                    return i, arg_errors[i]
+                # 单个工具出错时把错误作为结果交给模型，不影响其他工具
+                try:
+                    return i, await tasks[i]
+                except Exception as e:
+                    print(f"[red]函数 {tool_calls[i]['name']} 执行出错: {e}[/red]")
+                    return i, {"error": f"{type(e).__name__}: {e}"}
+
+            # 按完成顺序写回结果，进度随每个工具的结束而更新
+            for fut in asyncio.as_completed([finish(i) for i in order]):
+                i, result = await fut
+                name = tool_calls[i]["name"]
+                logger.info("[green]✔️[/green] 函数 %s 执行完成", name)
+                progress.update(task_id, description=f"函数 {name} 完成")
                 messages.append({
                     "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": json.dumps(result, ensure_ascii=False)
+                    "tool_call_id": tool_calls[i]["id"],
+                    "content": orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS).decode()
                 })
-            continue
-        break
+        except BaseException:
+            # 流中断、被取消或出错时，取消已在流式阶段启动的工具并等待其退出，避免遗留扫描
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
     progress.update(task_id, completed=100)
-    return msg.content or ""
+    if cache_key and msg["content"]:
+        prompt_cache.put(cache_key, msg["content"])
+    return msg["content"] or ""
 
-async def url_injection_analysis(progress: Progress, url: str) -> str:
+async def url_injection_analysis(progress: Progress, url: str, use_cache: bool = True) -> str:
     """
     生成对指定 URL 注入端点的分析消息。
     """
-    messages  = [{"role": "user", "content": url_injection_prompt.format(injection_url=url, time = datetime.now().strftime("%Y-%m-%d %H:%M:%S %Z"))}]
-    # 从 all_tools 中提取只与  URL 注入扫描相关的工具
-    url_tools = [tool for tool in all_tools if tool["function"]["name"] in [
-        "scan_sql_injection", 
-        "scan_template_injection",
-        "fetch_url_content",
-    ]]
-    result = await function_call(progress, messages, tools=url_tools)
+    messages = [
+        _URL_INJECTION_SYSTEM,
+        {"role": "user", "content": url_injection_task.format(injection_url=url, time=time.strftime("%Y-%m-%d %H:%M:%S %Z"))},
+    ]
+    cache_key = PromptCache.make_key(config.openai_model, _URL_INJECTION_TOOLS, [url_injection_prompt, url])
+    result = await function_call(progress, messages, tools=_URL_INJECTION_TOOLS, cache_key=cache_key, use_cache=use_cache)
     return result
 
-async def generate_domain_analysis(progress: Progress, domain: str) -> str:
+async def generate_domain_analysis(progress: Progress, domain: str, use_cache: bool = True) -> str:
     """
     生成对指定域名的分析消息。
     """
-    messages  = [{"role": "user", "content": domain_scan_prompt.format(domain=domain, time = datetime.now().strftime("%Y-%m-%d %H:%M:%S"))}]
-    domain_tools = [tool for tool in all_tools if tool["function"]["name"] in [
-        "scan_subdomain_enumeration",
-        "scan_port_scanning",
-    ]]
-    result = await function_call(progress, messages, tools=domain_tools)
+    messages = [
+        _DOMAIN_SYSTEM,
+        {"role": "user", "content": domain_scan_task.format(domain=domain, time=time.strftime("%Y-%m-%d %H:%M:%S"))},
+    ]
+    cache_key = PromptCache.make_key(config.openai_model, _DOMAIN_TOOLS, [domain_scan_prompt, domain])
+    result = await function_call(progress, messages, tools=_DOMAIN_TOOLS, cache_key=cache_key, use_cache=use_cache)
     return result
 
+# WebTree 可用性检查结果，进程内只检查一次
+_webtree_ok: asyncio.Future | None = None
+
 async def website_full_analysis(progress: Progress, website: str, use_poc: bool = False, max_links: int = 100) -> str:
     """
     对整个网站进行全面扫描分析。
@@ -98,13 +258,16 @@ async def website_full_analysis(progress: Progress, website: str, use_poc: bool
         max_links: 最大访问链接数量限制
     """
     from tools.webtree_wrapper import webtree
+    global _webtree_ok
     
     # 添加扫描任务到进度条
     task = progress.add_task(f"正在使用 WebTree 扫描网站: {website}", total=None)
     
     try:
         # 检查工具是否可用
-        if not await webtree.check():
+        if _webtree_ok is None:
+            _webtree_ok = asyncio.ensure_future(webtree.check())
+        if not await _webtree_ok:
             progress.update(task, description="WebTree 工具检查失败")
             return "❌ WebTree 工具不可用，请检查 Node.js 安装和工具配置"
         
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import time
+from hashlib import blake2b
+from typing import Any, Iterable, Optional, Tuple
+
+import orjson
+
+from config import config
+
+
+class PromptCache:
+    """
+    基于 SQLite 的 LLM 分析结果缓存。
+
+    以 (模型, 工具集合, 请求内容) 的哈希作为键，在 TTL 内对同一目标的重复分析
+    直接返回上次的报告，避免重复消耗 token 和扫描时间。
+    """
+    def __init__(self, path: str, ttl: int = 3600):
+        self.path = path
+        self.ttl = ttl
+        # 连接在首次读写时才打开，导入模块时不创建目录和数据库文件
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """惰性打开数据库连接并建表"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_cache ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, tools: Iterable[dict], payload: Any) -> str:
+        """生成缓存键，工具按名称排序后参与哈希"""
+        tool_names = sorted(tool["function"]["name"] for tool in tools)
+        raw = orjson.dumps([model, tool_names, payload], option=orjson.OPT_SORT_KEYS)
+        return blake2b(raw, digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """读取未过期的缓存内容，返回 (内容, 写入时间戳)"""
+        row = self.conn.execute(
+            "SELECT content, created FROM prompt_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        content, created = row
+        if time.time() - created > self.ttl:
+            self.conn.execute("DELETE FROM prompt_cache WHERE key = ?", (key,))
+            self.conn.commit()
+            return None
+        return content, created
+
+    def put(self, key: str, content: str) -> None:
+        """写入缓存内容"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO prompt_cache (key, content, created) VALUES (?, ?, ?)",
+            (key, content, time.time()),
+        )
+        self.conn.commit()
+
+
+prompt_cache = PromptCache(config.prompt_cache_path, ttl=config.prompt_cache_ttl)
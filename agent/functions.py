@@ -1,17 +1,26 @@
-from tools import *
+from tools import ffuf_wrapper, sqlmap_wrapper, sstimap_wrapper, oneforall_wrapper
 import asyncio
+import functools
 import os
+import time
+from hashlib import blake2b
+from http.cookiejar import CookieJar, DefaultCookiePolicy
 from urllib.parse import urlparse
 from rich import print
 import json
-from httpx import AsyncClient
+import orjson
+from httpx import AsyncClient, HTTPError, Limits, Timeout
+from logger import get_logger
 
-sqlmap_scanner = sqlmap_wrapper.Sqlmap()
-sstimap_scanner = sstimap_wrapper.SSTImap()
-oneforall_scanner = oneforall_wrapper.OneForAll()
+logger = get_logger("functions")
 
+sqlmap_scanner = sqlmap_wrapper.sqlmap
+sstimap_scanner = sstimap_wrapper.sstimap
+oneforall_scanner = oneforall_wrapper.oneforall
 
-all_tools = [
+
+# 工具定义在导入时构建一次，使用元组避免被调用方意外修改
+all_tools = (
     {
         "type": "function",
         "function": {
@@ -30,7 +39,11 @@ all_tools = [
                     },
                     "threads": {
                         "type": "integer",
-                        "description": "扫描线程数，默认为 None。"
+                        "description": "扫描线程数，默认为 200。"
+                    },
+                    "rate": {
+                        "type": "integer",
+                        "description": "每秒最大请求数，用于限速以免影响目标服务，默认不限制。"
                     },
                     "match_codes": {
                         "type": "string",
@@ -157,10 +170,38 @@ all_tools = [
             }
         }
     }
-]
+)
+
+# 按名称索引的工具定义
+TOOLS_BY_NAME = {tool["function"]["name"]: tool for tool in all_tools}
+
+# 工具结果缓存: key -> (写入时间, 结果)
+_tool_cache = {}
+
+def tool_cache(ttl=1800):
+    """
+    按参数缓存只读扫描工具的结果，TTL 内的重复调用不再启动外部扫描器。
+    有状态的扫描（如 sqlmap）不应使用此装饰器；空结果不缓存，以便失败后重试。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            raw = orjson.dumps([args, kwargs], option=orjson.OPT_SORT_KEYS)
+            key = f"{func.__name__}:{blake2b(raw, digest_size=16).hexdigest()}"
+            entry = _tool_cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                logger.info("[grey54]  %s 命中缓存", func.__name__)
+                return entry[1]
+            result = await func(*args, **kwargs)
+            if result:
+                _tool_cache[key] = (time.monotonic(), result)
+            return result
+        return wrapper
+    return decorator
 
 # 定义异步扫描函数
 
+@functools.lru_cache(maxsize=1024)
 def get_host_from_url(url):
     """从 URL 中提取主机名，用于生成输出目录"""
     try:
@@ -175,23 +216,42 @@ def get_host_from_url(url):
     except Exception:
         return "unknown_host"
 
-def get_output_dir(target):
-    """生成基于目标的输出目录路径"""
-    # 确保 test 目录存在
-    base_dir = "test"
-    os.makedirs(base_dir, exist_ok=True)
-    
+# 所有扫描结果的输出根目录
+OUTPUT_BASE_DIR = "test"
+
+# 本进程中已创建过的目录，避免重复的 makedirs 系统调用
+_created_dirs = set()
+
+@functools.lru_cache(maxsize=1024)
+def _compute_output_dir(target):
+    """计算目标对应的输出目录路径（不访问文件系统）"""
     # 对于 URL，提取主机名；对于主机名，直接使用
     if target.startswith(('http://', 'https://')):
         host = get_host_from_url(target)
     else:
         host = target.replace('.', '_').replace('-', '_')
-    
-    output_dir = os.path.join(base_dir, host)
-    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(OUTPUT_BASE_DIR, host)
+
+def _ensure_dir(path):
+    """每个目录在进程内至多创建一次"""
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(path)
+
+def get_output_dir(target):
+    """生成基于目标的输出目录路径"""
+    # makedirs 会一并创建上级的输出根目录
+    output_dir = _compute_output_dir(target)
+    _ensure_dir(output_dir)
     return output_dir
 
-async def scan_directory_fuzzing(target_url, wordlist=None, threads=None, match_codes=None):
+def _write_json(path, data):
+    """将结果以 JSON 格式写入文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+@tool_cache()
+async def scan_directory_fuzzing(target_url, wordlist=None, threads=None, match_codes=None, rate=None):
     """使用 ffuf 进行目录和文件模糊测试"""
     output_dir = get_output_dir(target_url)
     return await ffuf_wrapper.scan(
@@ -199,17 +259,52 @@ async def scan_directory_fuzzing(target_url, wordlist=None, threads=None, match_
         output_dir=output_dir,
         wordlist=wordlist or "/usr/share/dirb/wordlists/common.txt",
         threads=threads,
+        rate=rate,
         match_codes=match_codes
     )
 
+async def _wait_for_sqlmap_ready(timeout=10.0):
+    """以指数退避轮询 sqlmap API 的 /version，返回服务是否在超时前就绪"""
+    url = f"http://{sqlmap_scanner.host}:{sqlmap_scanner.port}/version"
+    client = await _get_client()
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get(url, timeout=1.0)
+            if response.status_code == 200:
+                return True
+        except HTTPError:
+            pass
+        await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 2, 1.0)
+    return False
+
+# sqlmap API 服务状态，锁保证并发调用时只启动一次服务
+_sqlmap_lock = asyncio.Lock()
+_sqlmap_ready = asyncio.Event()
+
+async def _ensure_sqlmap_started():
+    """按需启动 sqlmap API 服务并等待就绪，返回服务是否可用"""
+    if _sqlmap_ready.is_set():
+        return True
+    async with _sqlmap_lock:
+        if not _sqlmap_ready.is_set():
+            await sqlmap_scanner.start()
+            if not await _wait_for_sqlmap_ready():
+                print(f"[red]SQLMap API 未在预期时间内就绪: {sqlmap_scanner.host}:{sqlmap_scanner.port}[/red]")
+                await sqlmap_scanner.stop()
+                return False
+            _sqlmap_ready.set()
+    return True
+
 async def scan_sql_injection(target_url, data=None, options=None):
     """使用 sqlmap 进行 SQL 注入扫描，自动管理 API 服务"""
     output_dir = get_output_dir(target_url)
     
     # sqlmap 需要特殊处理：启动 API 服务
-    if not hasattr(sqlmap_scanner, 'process') or sqlmap_scanner.process is None:
-        await sqlmap_scanner.start()
-        await asyncio.sleep(5)  # 等待服务启动
+    if not await _ensure_sqlmap_started():
+        return []
     
     try:
         result = await sqlmap_scanner.scan(
@@ -222,6 +317,7 @@ async def scan_sql_injection(target_url, data=None, options=None):
     except Exception as e:
         print(f"[red]SQLMap 扫描出错: {e}[/red]")
         # 如果扫描出错，返回空结果
+        _sqlmap_ready.clear()
         await sqlmap_scanner.stop()
         return []
 
@@ -234,6 +330,7 @@ async def scan_template_injection(target_url, extra_args=None):
         extra_args=extra_args
     )
 
+@tool_cache()
 async def scan_subdomain_enumeration(target_host, extra_args=None):
     """使用 OneForAll 进行子域名枚举"""
     output_dir = get_output_dir(target_host)
@@ -243,103 +340,147 @@ async def scan_subdomain_enumeration(target_host, extra_args=None):
         extra_args=extra_args
     )
 
+# 扫描类型到 nmap 参数的映射
+_SCAN_TYPE_FLAGS = {
+    "tcp": "-sT",
+    "syn": "-sS",
+    "udp": "-sU",
+    "fin": "-sF",
+    "xmas": "-sX",
+    "null": "-sN",
+    "ack": "-sA",
+}
+
+# 端口结果字段到 nmap 输出字段的映射
+_PORT_FIELDS = {
+    "service": "name",
+    "version": "version",
+    "product": "product",
+    "extrainfo": "extrainfo",
+}
+
+# 未指定端口时将全端口范围拆成 4 段，由多个 nmap 进程并行扫描
+_FULL_PORT_CHUNKS = tuple(f"{start}-{min(start + 16383, 65535)}" for start in range(1, 65536, 16384))
+
+def _scan_chunk(scanner_cls, target, ports, nmap_args):
+    """在工作线程中创建 PortScanner 并扫描一段端口，构造时的 nmap -V 调用也不会阻塞事件循环"""
+    return scanner_cls().scan(target, ports, nmap_args)
+
+@tool_cache()
 async def scan_port_scanning(target, ports=None, scan_type="tcp", service_detection=False):
     """使用 python-nmap 进行端口扫描"""
     output_dir = get_output_dir(target)
     
+    # 仅在实际端口扫描时导入 python-nmap
+    import nmap
+
     try:
-        # 创建 nmap 对象
-        nm = nmap.PortScanner()
-        
         # 构建扫描参数
-        nmap_args = ""
-        
-        # 设置扫描类型
-        if scan_type == "tcp":
-            nmap_args += "-sT "
-        elif scan_type == "syn":
-            nmap_args += "-sS "
-        elif scan_type == "udp":
-            nmap_args += "-sU "
-        elif scan_type == "fin":
-            nmap_args += "-sF "
-        elif scan_type == "xmas":
-            nmap_args += "-sX "
-        elif scan_type == "null":
-            nmap_args += "-sN "
-        elif scan_type == "ack":
-            nmap_args += "-sA "
-        
-        # 激进扫描模式
-        
+        parts = []
+        if scan_type in _SCAN_TYPE_FLAGS:
+            parts.append(_SCAN_TYPE_FLAGS[scan_type])
         if service_detection:
-            nmap_args += "-sV "
+            parts.append("-sV")
+        nmap_args = " ".join(parts)
         
         # 设置端口范围
         port_range = ports or "1-65535"
         
-        print(f"[grey54]  开始对 {target} 进行端口扫描...")
-        print(f"[grey54]  扫描参数: {nmap_args.strip()}")
-        print(f"[grey54]  端口范围: {port_range}")
+        logger.info("[grey54]  开始对 %s 进行端口扫描...", target)
+        logger.info("[grey54]  扫描参数: %s", nmap_args)
+        logger.info("[grey54]  端口范围: %s", port_range)
         
         # 执行扫描
-        scan_result = nm.scan(target, port_range, arguments=nmap_args.strip())
+        # PortScanner 的构造和 scan 都是同步阻塞调用，整体放到线程中执行以免阻塞事件循环
+        port_ranges = [ports] if ports else _FULL_PORT_CHUNKS
+        scan_results = await asyncio.gather(*(
+            asyncio.to_thread(_scan_chunk, nmap.PortScanner, target, chunk, nmap_args)
+            for chunk in port_ranges
+        ))
+
+        # 合并各段的扫描结果
+        hosts = {}
+        for scan_result in scan_results:
+            for host, host_data in scan_result.get("scan", {}).items():
+                merged = hosts.setdefault(host, host_data)
+                if merged is not host_data:
+                    for protocol in host_data.all_protocols():
+                        merged.setdefault(protocol, {}).update(host_data[protocol])
         
-        # 处理扫描结果
+        # 处理扫描结果，直接遍历主机字典，每个端口只查找一次
         results = []
-        for host in nm.all_hosts():
-            host_info = {
+        for host, host_data in hosts.items():
+            open_ports = [
+                {
+                    "port": port,
+                    "protocol": protocol,
+                    "state": port_data['state'],
+                    **{key: port_data.get(field, '') for key, field in _PORT_FIELDS.items()}
+                }
+                for protocol in host_data.all_protocols()
+                for port, port_data in sorted(host_data[protocol].items())
+                if port_data['state'] == 'open'
+            ]
+            results.append({
                 "host": host,
-                "hostname": nm[host].hostname() if nm[host].hostname() else "",
-                "state": nm[host].state(),
-                "open_ports": [],
+                "hostname": host_data.hostname(),
+                "state": host_data.state(),
+                "open_ports": open_ports,
                 "os_info": {}
-            }
-            
-            # 获取开放端口信息
-            for protocol in nm[host].all_protocols():
-                ports_list = nm[host][protocol].keys()
-                for port in sorted(ports_list):
-                    port_state = nm[host][protocol][port]['state']
-                    if port_state == 'open':
-                        port_info = {
-                            "port": port,
-                            "protocol": protocol,
-                            "state": port_state,
-                            "service": nm[host][protocol][port].get('name', ''),
-                            "version": nm[host][protocol][port].get('version', ''),
-                            "product": nm[host][protocol][port].get('product', ''),
-                            "extrainfo": nm[host][protocol][port].get('extrainfo', '')
-                        }
-                        host_info["open_ports"].append(port_info)
-            
-            results.append(host_info)
+            })
         
         # 保存结果到文件
         output_file = os.path.join(output_dir, f"nmap_scan.txt")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=4, ensure_ascii=False)
+        await asyncio.to_thread(_write_json, output_file, results)
         
-        print(f"[grey54]  扫描完成！结果已保存到: {output_file}")
+        logger.info("[grey54]  扫描完成！结果已保存到: %s", output_file)
         return results
         
     except Exception as e:
         print(f"[red]Nmap 扫描出错: {e}[/red]")
         return []
 
+# fetch_url_content 共享的 HTTP 客户端，复用连接池和 TLS 会话
+_client = None
+_client_lock = asyncio.Lock()
+
+async def _get_client():
+    """惰性创建共享的 HTTP 客户端"""
+    global _client
+    if _client is None:
+        async with _client_lock:
+            if _client is None:
+                _client = AsyncClient(
+                    http2=True,
+                    # 共享的是连接池而不是会话：拒绝保存任何 Cookie，每次抓取都像新客户端一样
+                    cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+                    timeout=Timeout(10.0),
+                    limits=Limits(max_keepalive_connections=20, max_connections=100),
+                )
+    return _client
+
+async def close_http_client():
+    """关闭共享的 HTTP 客户端，下次使用时会重新创建"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+@tool_cache()
 async def fetch_url_content(url):
     """使用 httpx 异步获取 URL 内容"""
-    async with AsyncClient() as client:
-        try:
-            response = await client.get(url)
-            if response.status_code == 200:
-                return response.text
-            else:
+    client = await _get_client()
+    try:
+        # 先读取响应头，非 200 时不下载响应体
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
                 print(f"[red]请求失败，状态码: {response.status_code}[/red]")
                 return None
-        except Exception as e:
-            print(f"[red]请求出错: {e}[/red]")
-            return None
+            await response.aread()
+            return response.text
+    except Exception as e:
+        print(f"[red]请求出错: {e}[/red]")
+        return None
 
 # 将函数名映射到实际的异步扫描函数
 function_map = {
@@ -5,5 +5,9 @@ class AppConfig(BaseSettings):
     openai_base_url: str = "https://api.openai.com/v1"
     openai_api_key: str
     openai_model: str
+    prompt_cache_path: str = ".cache/prompt_cache.sqlite3"
+    prompt_cache_ttl: int = 3600
+    # 每分钟最多启动的工具调用数，0 表示不限制
+    tool_calls_per_minute: int = 0
 
 config = AppConfig()
\ No newline at end of file
@@ -0,0 +1,26 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+from rich.logging import RichHandler
+
+# 日志记录只入队，终端渲染由后台线程完成，调用方不必等待 TTY 输出
+_queue = queue.Queue(-1)
+_listener = QueueListener(
+    _queue,
+    RichHandler(show_time=False, show_level=False, show_path=False, markup=True),
+)
+
+_root = logging.getLogger("sre")
+_root.setLevel(logging.INFO)
+_root.addHandler(QueueHandler(_queue))
+_root.propagate = False
+
+_listener.start()
+atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取挂在 sre 日志器下的子日志器"""
+    return _root.getChild(name)
@@ -4,15 +4,26 @@ import sys
 from asyncio.subprocess import Process
 from rich import print
 import click
-from tools import *
 from tools_check import checker
-from agent import *
+from agent import client, website_full_analysis, url_injection_analysis, generate_domain_analysis
+from agent.functions import close_http_client, sqlmap_scanner
 
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.console import Console
 
 console = Console()
 
+def run(coro):
+    """运行扫描协程，结束后在同一事件循环中关闭共享的 HTTP 客户端、sqlmap API 客户端和 LLM 客户端"""
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_http_client()
+            await sqlmap_scanner.close_client()
+            await client.close()
+    return asyncio.run(runner())
+
 @click.command()
 @click.argument('website', type=str, default=None, required=False)
 @click.option(
@@ -45,7 +56,12 @@ console = Console()
     default=100,
     help='最大访问链接数量限制 (默认: 100)'
 )
-def main(website, no_check, url, host, poc, max_links):
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='忽略已缓存的分析结果，强制重新扫描'
+)
+def main(website, no_check, url, host, poc, max_links, no_cache):
     'main.py https://example.com/ 对一个网站进行完整扫描'
     result = None
     
@@ -71,7 +87,7 @@ def main(website, no_check, url, host, poc, max_links):
                 SpinnerColumn(),
                 TextColumn("{task.description}"),
                 ) as progress:
-                result = asyncio.run(website_full_analysis(progress, website, use_poc_interactive, max_links))
+                result = run(website_full_analysis(progress, website, use_poc_interactive, max_links))
                 print(f"[green]✔️[/green] 网站自动扫描完成。")
         elif scan_type == "URL注入分析":
             url = questionary.text("请输入 URL 端点 (例如: http://example.com/?name=1):").ask()
@@ -79,7 +95,7 @@ def main(website, no_check, url, host, poc, max_links):
                 SpinnerColumn(),
                 TextColumn("{task.description}"),
             ) as progress:
-                result = asyncio.run(url_injection_analysis(progress, url))
+                result = run(url_injection_analysis(progress, url, use_cache=not no_cache))
                 print(f"[green]✔️[/green] 注入分析完成。")
         elif scan_type == "主机扫描":
             host = questionary.text("请输入主机地址 (例如: example.com):").ask()
@@ -87,7 +103,7 @@ def main(website, no_check, url, host, poc, max_links):
                 SpinnerColumn(),
                 TextColumn("{task.description}"),
             ) as progress:
-                result = asyncio.run(generate_domain_analysis(progress, host))
+                result = run(generate_domain_analysis(progress, host, use_cache=not no_cache))
                 print(f"[green]✔️[/green] 主机 {host} 扫描完成。")
 
 
@@ -99,17 +115,17 @@ def main(website, no_check, url, host, poc, max_links):
             if website:
                 if not no_check:
                     asyncio.run(checker())
-                result = asyncio.run(website_full_analysis(progress, website, poc, max_links))
+                result = run(website_full_analysis(progress, website, poc, max_links))
                 print(f"[green]✔️[/green] 网站自动扫描完成。")
             elif url:
                 if not no_check:
                     asyncio.run(checker())
-                result = asyncio.run(url_injection_analysis(progress, url))
+                result = run(url_injection_analysis(progress, url, use_cache=not no_cache))
                 print(f"[green]✔️[/green] 注入分析完成。")
             elif host:
                 if not no_check:
                     asyncio.run(checker())
-                result = asyncio.run(generate_domain_analysis(progress, host))
+                result = run(generate_domain_analysis(progress, host, use_cache=not no_cache))
                 print(f"[green]✔️[/green] 主机 {host} 扫描完成。")
 
     if result:
@@ -1,4 +1,3 @@
-import nmap
 from . import ffuf_wrapper
 from . import sqlmap_wrapper
 from . import oneforall_wrapper
@@ -21,9 +21,18 @@ Ffuf 工具的异步 Python 封装库
         print(f"Found: {result['url']}")
 """
 import asyncio
-import json
+import os
+import re
 import sys
+from base64 import b64decode
+import orjson
 from typing import List, Dict, Any, Optional
+from logger import get_logger
+
+logger = get_logger("ffuf")
+
+# 未指定线程数时使用的默认值，ffuf 自身默认 40 对带宽充足的链路偏保守
+DEFAULT_THREADS = 200
 
 
 class FfufExecutionError(Exception):
@@ -33,12 +42,52 @@ class FfufExecutionError(Exception):
         self.stderr = stderr
 
 
+# 当前 ffuf 是否支持 -json 流式输出（2.0 起才有），进程内只检测一次
+_json_stream_supported: Optional[bool] = None
+
+
+async def _supports_json_stream() -> bool:
+    """通过 ffuf -V 的主版本号判断是否支持 -json 参数"""
+    global _json_stream_supported
+    if _json_stream_supported is None:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ffuf", "-V",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+            output, _ = await process.communicate()
+        except OSError:
+            output = b""
+        match = re.search(rb"(\d+)\.\d+", output)
+        _json_stream_supported = bool(match) and int(match.group(1)) >= 2
+        if not _json_stream_supported:
+            logger.info("[yellow]ffuf 版本低于 2.0，不支持 -json，改为扫描结束后读取结果文件[/yellow]")
+    return _json_stream_supported
+
+
+def _prefetch_wordlist(path: str) -> None:
+    """提示内核预读字典文件，减少 ffuf 冷启动时的磁盘等待。"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
 
 async def scan(
     url: str,
     output_dir: str,
     wordlist: str = "/usr/share/dirb/wordlists/common.txt",
     threads: Optional[int] = None,
+    rate: Optional[int] = None,
     match_codes: Optional[str] = None,
     filter_size: Optional[str] = None,
     headers: Optional[Dict[str, str]] = None,
@@ -50,7 +99,8 @@ async def scan(
     Args:
         url (str): 目标 URL，必须包含 'FUZZ' 关键字。
         wordlist (str): 字典文件路径。
-        threads (Optional[int]): 扫描线程数 (-t)。
+        threads (Optional[int]): 扫描线程数 (-t)，未指定时为 DEFAULT_THREADS。
+        rate (Optional[int]): 每秒请求数上限 (-rate)，用于避免压垮目标。
         match_codes (Optional[str]): 匹配的 HTTP 状态码 (-mc)，例如 "200,302"。
         filter_size (Optional[str]): 按大小过滤响应 (-fs)，例如 "123,0"。
         headers (Optional[Dict[str, str]]): 自定义 HTTP 请求头 (-H)。
@@ -72,8 +122,15 @@ async def scan(
         "-o" , file_path
     ]
 
-    if threads:
-        cmd.extend(["-t", str(threads)])
+    # -json 将每条结果作为一行 JSON 输出到 stdout，便于边扫描边解析（需要 ffuf >= 2.0）
+    stream_json = await _supports_json_stream()
+    if stream_json:
+        cmd.append("-json")
+
+    cmd.extend(["-t", str(threads or DEFAULT_THREADS)])
+
+    if rate:
+        cmd.extend(["-rate", str(rate)])
     
     if match_codes:
         cmd.extend(["-mc", match_codes])
@@ -88,7 +145,9 @@ async def scan(
     if extra_args:
         cmd.extend(extra_args)
 
-    print(f"[grey54]  执行命令: {' '.join(cmd)}")
+    logger.info("[grey54]  执行命令: %s", " ".join(cmd))
+
+    _prefetch_wordlist(wordlist)
 
     process = await asyncio.create_subprocess_exec(
         *cmd,
@@ -96,6 +155,56 @@ async def scan(
         stderr=asyncio.subprocess.PIPE
     )
 
+    if not stream_json:
+        return await _collect_from_file(process, file_path)
+
+    # 并发读取 stderr，避免进度输出填满管道导致 ffuf 阻塞
+    stderr_task = asyncio.create_task(process.stderr.read())
+
+    results = []
+    try:
+        async for line in process.stdout:
+            line = line.strip()
+            if not line.startswith(b"{"):
+                continue
+            result = orjson.loads(line)
+            results.append({
+                # -json 模式下 input 的值为 base64 编码
+                "key": b64decode(result["input"]["FUZZ"]).decode(errors="replace"),
+                "status": result["status"],
+                "size": result["length"],
+            })
+    except orjson.JSONDecodeError:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        raise FfufExecutionError(
+            "解析 ffuf JSON 输出失败。",
+            (await stderr_task).decode(errors='ignore')
+        )
+    except Exception as e:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        raise FfufExecutionError(
+            f"处理 ffuf 输出时发生未知错误: {e}",
+            (await stderr_task).decode(errors='ignore')
+        )
+
+    stderr = await stderr_task
+    await process.wait()
+
+    if process.returncode != 0:
+        raise FfufExecutionError(
+            f"Ffuf 执行失败，返回码: {process.returncode}",
+            stderr.decode(errors='ignore')
+        )
+
+    return results
+
+
+async def _collect_from_file(process: asyncio.subprocess.Process, file_path: str) -> List[Dict[str, Any]]:
+    """旧版 ffuf 不支持 -json，等待扫描结束后从 -o 输出文件读取结果"""
     stdout, stderr = await process.communicate()
 
     if process.returncode != 0:
@@ -105,19 +214,17 @@ async def scan(
         )
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        results = []
-        for result in data["results"]:
-            filtered = {
+        with open(file_path, "rb") as f:
+            data = orjson.loads(f.read())
+        return [
+            {
                 "key": result["input"]["FUZZ"],
                 "status": result["status"],
                 "size": result["length"],
             }
-            results.append(filtered)
-        return results
-        
-    except json.JSONDecodeError:
+            for result in data["results"]
+        ]
+    except orjson.JSONDecodeError:
         raise FfufExecutionError(
             "解析 ffuf JSON 输出失败。",
             stdout.decode(errors='ignore')
@@ -126,4 +233,4 @@ async def scan(
         raise FfufExecutionError(
             f"处理 ffuf 输出时发生未知错误: {e}",
             stdout.decode(errors='ignore')
-        )
\ No newline at end of file
+        )
@@ -1,7 +1,13 @@
 import asyncio
-import json
+import mmap
+import os
+import sys
+import orjson
 from rich import print
-from typing import Optional, Dict, List, Any
+from itertools import islice
+from typing import AsyncIterator, Optional, Dict, List, Any
+
+from .utils import probe_script
 
 class OneForAllExecutionError(Exception):
     """当 OneForAll 执行失败时抛出的自定义异常。"""
@@ -9,47 +15,41 @@ class OneForAllExecutionError(Exception):
         super().__init__(message)
         self.stderr = stderr
 
+# 超过该大小的结果文件通过 mmap 交给解析器，省去一次读缓冲区拷贝
+_MMAP_THRESHOLD = 64 * 1024
+
+def _load_results(file_path: str) -> List[Dict[str, Any]]:
+    """解析 OneForAll 的 JSON 结果文件"""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < _MMAP_THRESHOLD:
+            return orjson.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
 class OneForAll:
     def __init__(self):
         self.oneforall_path = "tools/module_oneforall/oneforall.py"
+        # 使用当前解释器运行子模块，保证与当前虚拟环境一致
+        self._cmd_prefix = (sys.executable, self.oneforall_path)
     async def check(self) -> bool:
-        process = await asyncio.create_subprocess_exec(
-            "python", self.oneforall_path, "--help",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        await process.communicate()
-        if process.returncode != 0:
+        if not await probe_script(self.oneforall_path):
             print(f"OneForAll 子模块 {self.oneforall_path} 不可用。请检查路径。")
             return False
         return True
 
-    async def scan(
+    async def _run(
         self,
         domain: str,
         output_dir: str,
         extra_args: Optional[List[str]] = None
-    ) -> List[Dict[str, Any]]:
-        """
-        异步执行 OneForAll 扫描。
-
-        Args:
-            domain (str): 目标域名。
-            output_dir (str): 输出目录。
-            extra_args (Optional[List[str]]): 其他要传递给 OneForAll 的原始参数。
-
-        Returns:
-            List[Dict[str, Any]]: OneForAll 扫描结果的列表，每个结果是一个字典。
-
-        Raises:
-            OneForAllExecutionError: 如果 OneForAll 执行失败或返回非零退出码。
-        """
+    ) -> str:
+        """执行 OneForAll 并返回结果文件路径"""
         file_path = f"{output_dir}/oneforall_output.json"
         
         # 构建命令列表
         cmd = [
-            "python",
-            "tools/module_oneforall/oneforall.py",
+            *self._cmd_prefix,
             "--fmt=json",
             f"--path={file_path}",
             "--target", domain,
@@ -72,10 +72,76 @@ class OneForAll:
                 f"OneForAll 执行失败，返回码：{process.returncode}",
                 stderr.decode()
             )
+        return file_path
+
+    async def scan(
+        self,
+        domain: str,
+        output_dir: str,
+        extra_args: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        异步执行 OneForAll 扫描。
+
+        Args:
+            domain (str): 目标域名。
+            output_dir (str): 输出目录。
+            extra_args (Optional[List[str]]): 其他要传递给 OneForAll 的原始参数。
+
+        Returns:
+            List[Dict[str, Any]]: OneForAll 扫描结果的列表，每个结果是一个字典。
+
+        Raises:
+            OneForAllExecutionError: 如果 OneForAll 执行失败或返回非零退出码。
+        """
+        file_path = await self._run(domain, output_dir, extra_args)
 
         # 解析输出文件
-        with open(file_path, 'r') as f:
-            results = json.load(f)
+        return _load_results(file_path)
+
+    async def scan_iter(
+        self,
+        domain: str,
+        output_dir: str,
+        extra_args: Optional[List[str]] = None,
+        batch_size: int = 500
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        异步执行 OneForAll 扫描，并逐条产出结果，适用于结果文件很大的场景。
+
+        安装了 ijson 时增量解析结果文件，内存占用与文件大小无关；
+        否则退化为整体解析后逐条产出。
+
+        Args:
+            domain (str): 目标域名。
+            output_dir (str): 输出目录。
+            extra_args (Optional[List[str]]): 其他要传递给 OneForAll 的原始参数。
+            batch_size (int): 每次在线程中解析的记录数。
+
+        Yields:
+            Dict[str, Any]: 单条子域名结果。
+
+        Raises:
+            OneForAllExecutionError: 如果 OneForAll 执行失败或返回非零退出码。
+        """
+        file_path = await self._run(domain, output_dir, extra_args)
+        try:
+            import ijson
+        except ImportError:
+            for result in _load_results(file_path):
+                yield result
+            return
+
+        with open(file_path, 'rb') as f:
+            # use_float 让小数解析为 float 而不是 Decimal，与 orjson 解析的结果类型一致
+            items = ijson.items(f, 'item', use_float=True)
+            while True:
+                # 解析是同步的，按批放到线程中执行以免阻塞事件循环
+                batch = await asyncio.to_thread(list, islice(items, batch_size))
+                if not batch:
+                    break
+                for result in batch:
+                    yield result
 
-        return results
-            
\ No newline at end of file
+# 创建全局实例
+oneforall = OneForAll()
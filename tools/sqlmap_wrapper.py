@@ -2,8 +2,13 @@ import asyncio
 from asyncio.subprocess import Process
 from rich import print
 from typing import Optional, Dict, List, Any
-from httpx import AsyncClient
-import json, os
+from httpx import AsyncClient, Limits, Timeout
+import os
+import sys
+import time
+import orjson
+
+from .utils import probe_script
 
 class SqlmapExecutionError(Exception):
     """当 sqlmap 执行失败时抛出的自定义异常。"""
@@ -11,21 +16,64 @@ class SqlmapExecutionError(Exception):
         super().__init__(message)
         self.stderr = stderr
 
+# 扫描结果文件，每行是一次扫描的结果 (NDJSON)
+OUTPUT_FILE_NAME = "sqlmap_output.ndjson"
+
+def load_all(output_dir: str) -> List[Any]:
+    """读取输出目录中所有历史扫描的结果，每次扫描对应列表中的一项"""
+    output_file_path = os.path.join(output_dir, OUTPUT_FILE_NAME)
+    results = []
+    try:
+        with open(output_file_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    results.append(orjson.loads(line))
+                except orjson.JSONDecodeError as e:
+                    print(f"[yellow]跳过 {output_file_path} 中无法解析的行: {e}[/yellow]")
+    except FileNotFoundError:
+        pass
+    return results
+
+def _append_results(output_file_path: str, results: List[Any]) -> None:
+    """把一次扫描的结果作为一行 JSON 追加到结果文件"""
+    line = orjson.dumps(results, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+    with open(output_file_path, 'ab') as f:
+        f.write(line)
+
 class Sqlmap:
     def __init__(self):
         self.sqlmap_api_path = 'tools/module_sqlmap/sqlmapapi.py'
+        # 与当前进程使用同一解释器启动 API 服务
+        self._cmd_prefix = (sys.executable, self.sqlmap_api_path)
         self.host = '127.0.0.1'
         self.port = 8775
+        # 与 API 服务的连接在多次扫描间复用，首次扫描时创建，stop() 时关闭
+        self._client: Optional[AsyncClient] = None
+        # 已确认存在的输出目录，避免每次扫描重复 makedirs
+        self._dirs_made: set[str] = set()
+
+    def _get_client(self) -> AsyncClient:
+        """惰性创建指向 sqlmap API 的 HTTP 客户端"""
+        if self._client is None:
+            self._client = AsyncClient(
+                base_url=f"http://{self.host}:{self.port}",
+                headers={'Content-Type': 'application/json'},
+                timeout=Timeout(30.0),
+                limits=Limits(max_keepalive_connections=8),
+            )
+        return self._client
+
+    async def close_client(self):
+        """关闭与 API 服务之间的 HTTP 客户端，下次扫描时会重新创建"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def check(self) -> bool:
-        process = await asyncio.create_subprocess_exec(
-            "python", self.sqlmap_api_path, "--help",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        await process.communicate()
-        if process.returncode != 0:
-            print(f"OneForAll 子模块 {self.sqlmap_api_path} 不可用。请检查路径。")
+        if not await probe_script(self.sqlmap_api_path):
+            print(f"sqlmap 子模块 {self.sqlmap_api_path} 不可用。请检查路径。")
             return False
         return True
 
@@ -33,7 +81,7 @@ class Sqlmap:
         """启动 sqlmapapi.py 服务"""
         self.process: Optional[Process] = None
         self.cmd = [
-            'python', self.sqlmap_api_path, '-s', '--host', self.host, '--port', str(self.port)
+            *self._cmd_prefix, '-s', '--host', self.host, '--port', str(self.port)
         ]
         print(f"[grey54]  启动 sqlmap API 服务，地址: {self.host}:{self.port}...")
         print(f"[grey54]  执行命令: {' '.join(self.cmd)}")
@@ -46,6 +94,8 @@ class Sqlmap:
 
     async def stop(self):
         """停止 sqlmapapi.py 服务"""
+        await self.close_client()
+
         if self.process is None:
             print("sqlmap API 未运行。")
             return
@@ -71,92 +121,82 @@ class Sqlmap:
         await self.start()
     async def scan(self, url: str, output_dir: str, data: Optional[str] = None, options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """使用 httpx 异步调用 sqlmap API 执行扫描并获取结果"""
-        api_url = f"http://{self.host}:{self.port}"
-        headers = {'Content-Type': 'application/json'}
+        client = self._get_client()
         task_id = None
 
-        async with AsyncClient() as client:
-            try:
-                # 1. 创建新任务
-                new_task_resp = await client.get(f"{api_url}/task/new")
-                new_task_resp.raise_for_status()
-                task_id = new_task_resp.json().get("taskid")
-                if not task_id:
-                    raise SqlmapExecutionError("创建 sqlmap 任务失败。", "未返回 taskid")
-
-                # print(f"已创建 sqlmap 任务: {task_id}")
-
-                # 2. 设置扫描选项并启动扫描
-                scan_options = options or {}
-                scan_options['url'] = url
-                if data:
-                    scan_options['data'] = data
-
-                start_scan_resp = await client.post(f"{api_url}/scan/{task_id}/start", json=scan_options, headers=headers)
-                start_scan_resp.raise_for_status()
-                if not start_scan_resp.json().get("success"):
-                    raise SqlmapExecutionError(f"任务 {task_id} 启动扫描失败。", "API 返回 success: false")
-
-                # 3. 轮询扫描状态
-                while True:
-                    await asyncio.sleep(5)
-                    status_resp = await client.get(f"{api_url}/scan/{task_id}/status")
-                    status_resp.raise_for_status()
-                    status_data = status_resp.json()
-                    if status_data.get("status") == "terminated":
-                        break
+        try:
+            # 1. 创建新任务
+            new_task_resp = await client.get("/task/new")
+            new_task_resp.raise_for_status()
+            task_id = new_task_resp.json().get("taskid")
+            if not task_id:
+                raise SqlmapExecutionError("创建 sqlmap 任务失败。", "未返回 taskid")
+
+            # print(f"已创建 sqlmap 任务: {task_id}")
+
+            # 2. 设置扫描选项并启动扫描
+            scan_options = options or {}
+            scan_options['url'] = url
+            if data:
+                scan_options['data'] = data
+
+            start_scan_resp = await client.post(f"/scan/{task_id}/start", json=scan_options)
+            start_scan_resp.raise_for_status()
+            if not start_scan_resp.json().get("success"):
+                raise SqlmapExecutionError(f"任务 {task_id} 启动扫描失败。", "API 返回 success: false")
+
+            # 3. 轮询扫描状态，首次等待 0.5 秒，之后间隔为已运行时长的 1/4，限制在 0.5~5 秒
+            #    短扫描能很快发现结束，长扫描的轮询次数也不会随时长线性增长
+            started = time.monotonic()
+            delay = 0.5
+            last_status = None
+            while True:
+                await asyncio.sleep(delay)
+                status_resp = await client.get(f"/scan/{task_id}/status")
+                status_resp.raise_for_status()
+                status = status_resp.json().get("status")
+                if status == "terminated":
+                    break
+                if status != last_status:
+                    last_status = status
                     print(f"[grey]任务 {task_id} 正在扫描中...[/grey]")
+                delay = min(max(0.5, (time.monotonic() - started) / 4), 5.0)
 
-                # 4. 获取扫描结果
-                data_resp = await client.get(f"{api_url}/scan/{task_id}/data")
-                data_resp.raise_for_status()
-                # 确保输出目录存在
+            # 4. 获取扫描结果
+            data_resp = await client.get(f"/scan/{task_id}/data")
+            data_resp.raise_for_status()
+            # 确保输出目录存在
+            if output_dir not in self._dirs_made:
                 os.makedirs(output_dir, exist_ok=True)
-                output_file_path = os.path.join(output_dir, "sqlmap_output.json")
-
-                # 尝试读取已存在的结果
-                existing_results = []
-                if os.path.exists(output_file_path):
-                    try:
-                        with open(output_file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            if content:  # 确保文件不为空
-                                existing_results = json.loads(content)
-                                if not isinstance(existing_results, list):
-                                    print(f"[yellow]警告: {output_file_path} 的内容不是一个列表，将覆盖文件。[/yellow]")
-                                    existing_results = []
-                    except (json.JSONDecodeError, IOError) as e:
-                        print(f"[yellow]读取或解析 {output_file_path} 时出错: {e}。将创建新文件。[/yellow]")
-                        existing_results = []
-
-                # 获取当前扫描的结果
-                current_scan_results = data_resp.json().get("data", [])
-
-                # 如果有新的发现，则添加到结果列表并写入文件
-                if current_scan_results:
-                    # 将新结果作为一个整体添加到现有结果列表
-                    existing_results.append(current_scan_results)
-                    
-                    # 将更新后的列表写回文件
-                    try:
-                        with open(output_file_path, 'w', encoding='utf-8') as f:
-                            json.dump(existing_results, f, indent=4, ensure_ascii=False)
-                        print(f"[green]扫描结果已追加到 {output_file_path}[/green]")
-                    except IOError as e:
-                        print(f"[red]无法写入结果到 {output_file_path}: {e}[/red]")
-
-                scan_results = data_resp.json().get("data", [])
-
-                return scan_results
-
-            except Exception as e:
-                print(f"[red]sqlmap 扫描过程中发生错误: {e}[/red]")
-                return []
-            finally:
-                # 5. 清理任务
-                if task_id:
-                    await client.get(f"{api_url}/scan/{task_id}/delete")
-                    # print(f"已清理 sqlmap 任务: {task_id}")
+                self._dirs_made.add(output_dir)
+            output_file_path = os.path.join(output_dir, OUTPUT_FILE_NAME)
+
+            # 获取当前扫描的结果，响应体只解析一次
+            current_scan_results = orjson.loads(data_resp.content).get("data", [])
+
+            # 如果有新的发现，则作为一行 JSON 追加到结果文件，无需重写已有内容
+            if current_scan_results:
+                try:
+                    # 序列化和文件写入放到线程中，不阻塞其他扫描的轮询
+                    await asyncio.to_thread(_append_results, output_file_path, current_scan_results)
+                    print(f"[green]扫描结果已追加到 {output_file_path}[/green]")
+                except IOError as e:
+                    print(f"[red]无法写入结果到 {output_file_path}: {e}[/red]")
+
+            return current_scan_results
+
+        except Exception as e:
+            print(f"[red]sqlmap 扫描过程中发生错误: {e}[/red]")
+            return []
+        finally:
+            # 5. 清理任务
+            if task_id:
+                await client.get(f"/scan/{task_id}/delete")
+                # print(f"已清理 sqlmap 任务: {task_id}")
+
+# 创建全局实例
+sqlmap = Sqlmap()
+
 async def main():
     sqlmap_api = Sqlmap()  # 创建 sqlmap API 实例
     try:
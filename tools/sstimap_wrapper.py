@@ -1,8 +1,16 @@
 import asyncio
 import re
+import sys
 from rich import print
 from typing import Optional, Dict, List, Any
 
+from .utils import iter_line_blocks, probe_script
+
+# 用于移除 ANSI 颜色代码和 SSTImap 特定的状态符号
+_ANSI_RE = re.compile(r'(\x1b\[[0-9;]*[mK])|(\[92m\[\+\]\[0m)|(\[92m|\[0m)')
+# 匹配每行行首除换行外的空白字符
+_LEADING_WS_RE = re.compile(r'^[^\S\n]+', re.MULTILINE)
+
 class SSTImapExecutionError(Exception):
     """当 SSTImap 执行失败时抛出的自定义异常。"""
     def __init__(self, message, stderr):
@@ -12,15 +20,10 @@ class SSTImapExecutionError(Exception):
 class SSTImap:
     def __init__(self):
         self.sstimap_path = "tools/module_sstimap/sstimap.py"
+        self._cmd_prefix = (sys.executable, self.sstimap_path)
 
     async def check(self) -> bool:
-        process = await asyncio.create_subprocess_exec(
-            "python", self.sstimap_path, "--help",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        await process.communicate()
-        if process.returncode != 0:
+        if not await probe_script(self.sstimap_path):
             print(f"SSTImap 子模块 {self.sstimap_path} 不可用。请检查路径。")
             return False
         return True
@@ -48,8 +51,7 @@ class SSTImap:
         
         # 构建命令列表
         cmd = [
-            "python",
-            self.sstimap_path,
+            *self._cmd_prefix,
             "-u", url,
         ]
         
@@ -64,46 +66,52 @@ class SSTImap:
             stderr=asyncio.subprocess.PIPE
         )
 
-        stdout, stderr = await process.communicate()
+        start_marker = "SSTImap identified the following injection point:"
+        end_marker = "Rerun SSTImap providing one of the following options"
 
-        if process.returncode != 0:
+        # stderr 并发读取，避免管道写满阻塞子进程
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        parts = []
+        seen_start = False
+        stopped_early = False
+        async for chunk in iter_line_blocks(process.stdout):
+            # 解码并移除 ANSI 转义码和多余符号
+            text = _ANSI_RE.sub('', chunk.decode())
+            parts.append(text)
+            if start_marker in text:
+                seen_start = True
+            if seen_start and end_marker in text:
+                # 注入点信息已完整，之后的输出不再需要
+                if process.returncode is None:
+                    process.terminate()
+                stopped_early = True
+                break
+        await process.wait()
+        stderr = await stderr_task
+
+        if process.returncode != 0 and not stopped_early:
             raise SSTImapExecutionError(
                 f"SSTImap 执行失败，返回码: {process.returncode}",
                 stderr.decode()
             )
         else:
-            # 解码并移除 ANSI 转义码和多余符号
-            raw_results = stdout.decode().strip()
-            # 正则表达式，用于移除 ANSI 颜色代码和 SSTImap 特定的状态符号
-            ansi_escape = re.compile(r'(\x1b\[[0-9;]*[mK])|(\[92m\[\+\]\[0m)|(\[92m|\[0m)')
-            results = ansi_escape.sub('', raw_results)
+            results = "".join(parts).strip()
             
-            try:
-                start_marker = "SSTImap identified the following injection point:"
-                end_marker = "Rerun SSTImap providing one of the following options"
-                injection_info = []
-                capturing = False
-                for line in results.splitlines():
-                    if start_marker in line:
-                        capturing = True
-                    
-                    if capturing:
-                        # 移除行首的空白字符
-                        cleaned_line = line.lstrip()
-                        injection_info.append(cleaned_line)
-
-                    if end_marker in line:
-                        # 移除包含结束标记的最后一行
-                        if injection_info:
-                            injection_info.pop()
-                        capturing = False
-                        break
-        
-                # 使用换行符重新拼接，并移除前后的多余空白
-                output_text = "\n".join(injection_info).strip()
-                with open(file_path, 'w') as f:
-                    f.write(output_text)
-                return output_text
-            except ValueError:
+            start = results.find(start_marker)
+            if start == -1:
                 print("⚠️ 未能从 SSTImap 输出中提取注入点信息。")
-                return results
\ No newline at end of file
+                return results
+
+            # 截取从起始标记所在行到结束标记所在行之前的内容
+            start = results.rfind("\n", 0, start) + 1
+            end = results.find(end_marker, start)
+            end = results.rfind("\n", start, end) + 1 if end != -1 else len(results)
+
+            # 一次正则替换移除每行行首的空白字符，并移除前后的多余空白
+            output_text = _LEADING_WS_RE.sub('', results[start:end]).strip()
+            with open(file_path, 'w') as f:
+                f.write(output_text)
+            return output_text
+
+# 创建全局实例
+sstimap = SSTImap()
@@ -0,0 +1,48 @@
+import asyncio
+import sys
+from typing import AsyncIterator
+
+# 已验证可运行的子模块脚本路径，同一进程内不再重复试运行
+_probed_ok: set[str] = set()
+
+
+async def probe_script(script_path: str) -> bool:
+    """
+    以 --help 试运行 Python 子模块脚本，只关心返回码。
+
+    成功结果按路径缓存；失败不缓存，修复子模块后可以重新检查。
+    """
+    if script_path in _probed_ok:
+        return True
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, script_path, "--help",
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    await process.wait()
+    if process.returncode != 0:
+        return False
+    _probed_ok.add(script_path)
+    return True
+
+
+async def iter_line_blocks(stream: asyncio.StreamReader, chunk_size: int = 65536) -> AsyncIterator[bytes]:
+    """
+    按块读取子进程输出，每次产出以换行结尾的完整行块。
+
+    不足一行的尾部留到下一块再拼接，这样按块做 ANSI 清理或标记查找时
+    不会把同一行切成两半；流结束时剩余内容原样产出。
+    """
+    # 尚未遇到换行的片段先存入列表，只在找到换行时拼接一次，
+    # 避免长时间没有换行的输出（如 \r 刷新的进度条）反复复制和扫描
+    pending: list[bytes] = []
+    while chunk := await stream.read(chunk_size):
+        cut = chunk.rfind(b"\n") + 1
+        if not cut:
+            pending.append(chunk)
+            continue
+        pending.append(chunk[:cut])
+        yield b"".join(pending)
+        pending = [chunk[cut:]] if cut < len(chunk) else []
+    if pending:
+        yield b"".join(pending)
@@ -5,29 +5,29 @@ import re
 from rich import print
 from typing import Optional, Dict, List, Any
 
+from .utils import iter_line_blocks
+
 class WebTreeExecutionError(Exception):
     """当 WebTree 执行失败时抛出的自定义异常。"""
     def __init__(self, message, stderr):
         super().__init__(message)
         self.stderr = stderr
 
+# 匹配 ANSI 转义序列，以及丢失转义字符后残留的颜色代码如 [32m, [0m
+_ANSI_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])|\[[0-9;]*m')
+# 同一模式的字节版本，用于在解码前直接清理子进程输出
+_ANSI_RE_B = re.compile(_ANSI_RE.pattern.encode())
+
 def clean_ansi_codes(text: str) -> str:
     """
     清理文本中的ANSI颜色代码和控制字符
     """
-    # 移除ANSI转义序列
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    cleaned = ansi_escape.sub('', text)
-    
-    # 移除常见的颜色代码格式如 [32m, [0m 等
-    color_code_pattern = re.compile(r'\[[0-9;]*m')
-    cleaned = color_code_pattern.sub('', cleaned)
-    
-    return cleaned
+    return _ANSI_RE.sub('', text)
 
 class WebTree:
     def __init__(self):
         self.webtree_path = "tools/module_WebTree"
+        self.index_js_path = os.path.join(self.webtree_path, "index.js")
     
     async def check(self) -> bool:
         """检查 WebTree 工具是否可用"""
@@ -45,9 +45,8 @@ class WebTree:
                 return False
             
             # 检查 index.js 文件是否存在
-            index_js_path = os.path.join(self.webtree_path, "index.js")
-            if not os.path.exists(index_js_path):
-                print(f"WebTree 工具文件 {index_js_path} 不存在")
+            if not os.path.exists(self.index_js_path):
+                print(f"WebTree 工具文件 {self.index_js_path} 不存在")
                 return False
             
             return True
@@ -111,18 +110,27 @@ class WebTree:
                 cwd=self.webtree_path
             )
             
+            # stderr 并发读取，避免管道写满阻塞子进程
+            stderr_task = asyncio.ensure_future(process.stderr.read())
+            output_parts = []
+
+            async def collect_stdout():
+                # 按完整行块在字节层面增量清理 ANSI 颜色代码，最后只解码一次
+                async for block in iter_line_blocks(process.stdout):
+                    output_parts.append(_ANSI_RE_B.sub(b'', block))
+                await process.wait()
+
             try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), 
-                    timeout=timeout
-                )
+                await asyncio.wait_for(collect_stdout(), timeout=timeout)
             except asyncio.TimeoutError:
                 process.kill()
                 await process.wait()
+                stderr_task.cancel()
                 raise WebTreeExecutionError(
                     f"WebTree 扫描超时 ({timeout}秒)", 
                     "执行超时"
                 )
+            stderr = await stderr_task
             
             if process.returncode != 0:
                 error_msg = f"WebTree 执行失败，返回代码: {process.returncode}"
@@ -130,21 +138,19 @@ class WebTree:
                     error_msg += f"\n错误信息: {stderr.decode('utf-8', errors='ignore')}"
                 raise WebTreeExecutionError(error_msg, stderr.decode('utf-8', errors='ignore'))
             
-            # 解析输出
-            output = stdout.decode('utf-8', errors='ignore')
-            if not output.strip():
+            # 拼接已清理的输出
+            cleaned_output = b"".join(output_parts).decode('utf-8', errors='ignore')
+            if not cleaned_output.strip():
                 print(f"[yellow]⚠️[/yellow] WebTree 扫描完成，但没有输出结果")
                 return None
             
             print(f"[green]✅[/green] WebTree 扫描完成")
             
-            # 清理ANSI颜色代码
-            cleaned_output = clean_ansi_codes(output)
-            
             # 如果指定了输出文件，也读取文件内容
-            if output_file and os.path.exists(os.path.join(self.webtree_path, output_file)):
+            output_path = os.path.join(self.webtree_path, output_file) if output_file else None
+            if output_path and os.path.exists(output_path):
                 try:
-                    with open(os.path.join(self.webtree_path, output_file), 'r', encoding='utf-8') as f:
+                    with open(output_path, 'r', encoding='utf-8') as f:
                         file_content = f.read()
                     cleaned_file_content = clean_ansi_codes(file_content)
                     return f"控制台输出:\n{cleaned_output}\n\n文件输出:\n{cleaned_file_content}"
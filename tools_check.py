@@ -1,9 +1,9 @@
 import asyncio
+import os
 import questionary
-from asyncio.subprocess import Process
 from rich import print
 import subprocess
-from tools import *
+from tools import sstimap_wrapper, oneforall_wrapper, sqlmap_wrapper, webtree_wrapper
 
 # 定义需要检测的工具列表
 TOOLS_TO_CHECK = [
@@ -14,57 +14,47 @@ TOOLS_TO_CHECK = [
     "msfconsole"
 ]
 
-async def check_tool_availability(tool_name: str) -> tuple[str, str | None]:
+def find_tools(tool_names: list[str]) -> dict[str, str | None]:
     """
-    异步检查单个工具是否在 PATH 中可用。
+    扫描一次 PATH，批量查找工具的可执行文件路径。
 
     Args:
-        tool_name: 要检查的工具名称。
+        tool_names: 要检查的工具名称列表。
 
     Returns:
-        一个元组，包含工具名称和它的路径 (如果找到)，否则为 None。
+        工具名称到路径的映射，未找到的工具对应 None。
     """
-    try:
-        # 在 Unix/Linux/macOS 上使用 'which'
-        command = "which"
-        
-        process: Process = await asyncio.create_subprocess_exec(
-            command,
-            tool_name,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        
-        stdout, stderr = await process.communicate()
-        
-        if process.returncode == 0:
-            # 解码并去除路径末尾的换行符
-            path = stdout.decode().strip()
-            return tool_name, path
-        else:
-            return tool_name, None
-            
-    except FileNotFoundError:
-        # 如果 'which' 命令本身不存在
-        return tool_name, None
-    except Exception as e:
-        print(f"检查 '{tool_name}' 时发生意外错误: {e}")
-        return tool_name, None
+    found: dict[str, str] = {}
+    for directory in os.environ.get("PATH", os.defpath).split(os.pathsep):
+        if len(found) == len(tool_names):
+            break
+        try:
+            entries = set(os.listdir(directory or "."))
+        except OSError:
+            continue
+        for tool_name in tool_names:
+            if tool_name in found or tool_name not in entries:
+                continue
+            path = os.path.join(directory, tool_name)
+            if os.path.isfile(path) and os.access(path, os.X_OK):
+                found[tool_name] = path
+    return {tool_name: found.get(tool_name) for tool_name in tool_names}
 
-def install_tool(tool_name: str) -> None:
+def install_tool(tool_names: list[str]) -> None:
     """
-    安装工具
+    在一次 apt-get 事务中安装所有工具
 
     Args:
-        tool_name: 要安装的工具名称。
+        tool_names: 要安装的工具名称列表。
     """
 
-    print(f"🔧 正在安装 {tool_name}...")
+    names = " ".join(tool_names)
+    print(f"🔧 正在安装 {names}...")
     try:
         # 使用 apt-get 安装工具。-y 选项会自动回答 "yes"
         # 注意: 这需要用户有 sudo 权限，并且可能在执行时提示输入密码。
         process = subprocess.run(
-            ["sudo", "apt-get", "install", "-y", tool_name],
+            ["sudo", "apt-get", "install", "-y", *tool_names],
             capture_output=True,
             text=True,
             check=False  # 设置为 False，手动检查返回码
@@ -72,7 +62,7 @@ def install_tool(tool_name: str) -> None:
         
         if process.returncode != 0:
             # 如果安装失败，打印错误信息
-            print(f"[red]❌[/red] 安装 {tool_name} 失败。")
+            print(f"[red]❌[/red] 安装 {names} 失败。")
             error_message = process.stderr.strip()
             if error_message:
                 print(f"[red]❌[/red] 错误详情: {error_message}")
@@ -82,26 +72,26 @@ def install_tool(tool_name: str) -> None:
         print("[red]❌[/red] 命令 'sudo' 或 'apt-get' 未找到。请确保您在基于 Debian/Ubuntu 的系统上运行，并已安装 sudo。")
         return
     except Exception as e:
-        print(f"安装 '{tool_name}' 时发生意外错误: {e}")
+        print(f"安装 '{names}' 时发生意外错误: {e}")
         return
-    print(f"[green]✔️[/green] {tool_name} 安装完成！")
+    print(f"[green]✔️[/green] {names} 安装完成！")
 
 async def check_wrappers():
     """
     检查所有工具的 wrapper 是否可用。
     """
-    tasks = [
-        sstimap_wrapper.SSTImap().check(),
-        oneforall_wrapper.OneForAll().check(),
-        sqlmap_wrapper.Sqlmap().check(),
-        webtree_wrapper.webtree.check()
-    ]
-    results = await asyncio.gather(*tasks)
+    wrappers = {
+        "sstimap": sstimap_wrapper.sstimap,
+        "oneforall": oneforall_wrapper.oneforall,
+        "sqlmap": sqlmap_wrapper.sqlmap,
+        "webtree": webtree_wrapper.webtree,
+    }
+    results = await asyncio.gather(*(wrapper.check() for wrapper in wrappers.values()))
     
-    for result in results:
-        if not result:
-            print("[red]❌[/red] 某些工具的 wrapper 不可用，请检查路径或安装状态。")
-            return False
+    if not all(results):
+        failed = [name for name, ok in zip(wrappers, results) if not ok]
+        print(f"[red]❌[/red] 以下工具的 wrapper 不可用: {', '.join(failed)}，请检查路径或安装状态。")
+        return False
     print("[green]✔️[/green] 所有工具的 wrapper 均可用。")
     return True
 
@@ -109,8 +99,8 @@ async def checker():
     """
     主函数，协调整个检测流程。
     """
-    tasks = [check_tool_availability(tool) for tool in TOOLS_TO_CHECK]
-    results = await asyncio.gather(*tasks)
+    # 目录扫描是阻塞的文件系统调用，放到线程中执行
+    results = (await asyncio.to_thread(find_tools, TOOLS_TO_CHECK)).items()
     
     # 分类并展示结果
     found_tools = []
@@ -142,8 +132,7 @@ async def checker():
         ).ask_async()
         if should_install:
             print("\n🔧 正在安装未找到的工具...")
-            for tool in not_found_tools:
-                install_tool(tool)
+            install_tool(not_found_tools)
             print("\n🔧 安装完成!")
 
     # 检查工具的 wrapper 是否可用